@@ -0,0 +1,137 @@
+"""Retención: mueve paquetes cerrados antiguos (y sus evidencias) fuera de las tablas calientes.
+
+    python -m app.archive --days 90
+
+Pensado para cron (p.ej. `docker compose exec backend python -m app.archive` cada noche).
+Por lotes: cada lote es una transacción (INSERT ... SELECT al archivo + DELETE).
+"""
+import argparse
+import gzip
+import os
+import shutil
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, literal, func, case
+from sqlalchemy.orm import Session
+from . import models
+from .settings import settings
+
+CLOSED = (models.PackageStatus.delivered, models.PackageStatus.not_delivered)
+
+def archived_path(filename: str) -> str:
+    return os.path.join(settings.ARCHIVE_DIR, f"{filename}.gz")
+
+def _gzip_evidence(filename: str) -> bool:
+    """Copia comprimida en ARCHIVE_DIR (el original se borra recién después del commit)."""
+    src = os.path.join(settings.UPLOAD_DIR, filename)
+    dst = archived_path(filename)
+    if os.path.exists(dst):
+        return True
+    if not os.path.exists(src):
+        return False
+    tmp = dst + ".tmp"
+    with open(src, "rb") as fi, gzip.open(tmp, "wb", compresslevel=6) as fo:
+        shutil.copyfileobj(fi, fo)
+    os.replace(tmp, dst)
+    return True
+
+def _copy_cols(src: type, dst: type) -> list[str]:
+    return [c.name for c in dst.__table__.columns if c.name in src.__table__.c]
+
+def _add_archive_stats(db: Session, ids: list[int]):
+    rows = (
+        db.query(
+            models.Package.driver_id,
+            func.sum(case((models.Package.status == models.PackageStatus.delivered, 1), else_=0)),
+            func.sum(case((models.Package.status == models.PackageStatus.not_delivered, 1), else_=0)),
+        )
+        .filter(models.Package.id.in_(ids), models.Package.driver_id.isnot(None))
+        .group_by(models.Package.driver_id)
+        .all()
+    )
+    for driver_id, delivered, failed in rows:
+        st = db.get(models.DriverArchiveStats, driver_id)
+        if st is None:
+            st = models.DriverArchiveStats(driver_id=driver_id, delivered=0, failed=0)
+            db.add(st)
+        st.delivered += int(delivered or 0)
+        st.failed += int(failed or 0)
+
+def archive_closed(db: Session, older_than_days: int, batch_size: int = 500) -> int:
+    """Archiva paquetes cerrados antes de `older_than_days`. Devuelve cuántos movió."""
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    pkg_cols = _copy_cols(models.Package, models.ArchivedPackage)
+    proof_cols = _copy_cols(models.ProofImage, models.ArchivedProofImage)
+    total = 0
+
+    while True:
+        # lote bloqueado hasta el commit: un assign_by_code que reabra uno de estos espera (o ya ganó
+        # y el paquete no se selecciona); INSERT/DELETE por id no pueden mover un paquete reabierto
+        ids = [
+            i for (i,) in db.query(models.Package.id)
+            .filter(models.Package.status.in_(CLOSED), models.Package.closed_at < cutoff)
+            .order_by(models.Package.closed_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ]
+        if not ids:
+            break
+        files = [f for (f,) in db.query(models.ProofImage.filename).filter(models.ProofImage.package_id.in_(ids))]
+        for f in files:
+            _gzip_evidence(f)
+
+        now = datetime.utcnow()
+        pkg_t, proof_t = models.Package.__table__, models.ProofImage.__table__
+        db.execute(
+            insert(models.ArchivedPackage).from_select(
+                pkg_cols + ["archived_at"],
+                select(*[pkg_t.c[c] for c in pkg_cols], literal(now)).where(pkg_t.c.id.in_(ids)),
+            )
+        )
+        db.execute(
+            insert(models.ArchivedProofImage).from_select(
+                proof_cols,
+                select(*[proof_t.c[c] for c in proof_cols]).where(proof_t.c.package_id.in_(ids)),
+            )
+        )
+        _add_archive_stats(db, ids)
+        db.execute(delete(models.ProofImage).where(models.ProofImage.package_id.in_(ids)))
+        db.execute(delete(models.Package).where(models.Package.id.in_(ids)))
+        db.commit()
+
+        for f in files:
+            try:
+                os.remove(os.path.join(settings.UPLOAD_DIR, f))
+            except FileNotFoundError:
+                pass
+        total += len(ids)
+    return total
+
+def find_by_code(db: Session, code: str) -> tuple[models.Package | models.ArchivedPackage | None, bool]:
+    """Busca primero en caliente y, si no está, en el archivo. Devuelve (paquete, archivado)."""
+    pkg = db.query(models.Package).filter(models.Package.code == code).first()
+    if pkg:
+        return pkg, False
+    pkg = db.query(models.ArchivedPackage).filter(models.ArchivedPackage.code == code).first()
+    return pkg, pkg is not None
+
+def archived_proofs(db: Session, package_id: int) -> list[models.ArchivedProofImage]:
+    return db.query(models.ArchivedProofImage).filter(models.ArchivedProofImage.package_id == package_id).all()
+
+def main():
+    from .db import SessionLocal
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    ap.add_argument("--batch", type=int, default=500)
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        n = archive_closed(db, args.days, args.batch)
+    finally:
+        db.close()
+    print(f"archived {n} packages closed more than {args.days} days ago")
+
+if __name__ == "__main__":
+    main()
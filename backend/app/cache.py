@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List
+from starlette.concurrency import run_in_threadpool
+from .settings import settings
+
+class _LeaderCancelled(Exception):
+    """El request que calculaba se canceló: quienes esperaban reintentan (no se cancelan ellos)."""
+
+@dataclass
+class _Inflight:
+    future: asyncio.Future
+    tags: frozenset
+    patches: List[Callable[[Any], Any]] = field(default_factory=list)
+
+class ResponseCache:
+    """Caché en proceso para lecturas del admin: TTL + LRU acotado, invalidación por tags.
+
+    Varios misses concurrentes de la misma clave comparten un único cálculo (single-flight).
+    `invalidate`/`patch` se pueden llamar también desde el threadpool (endpoints síncronos).
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, frozenset, Any]]" = OrderedDict()  # key -> (expira, tags, valor)
+        self._inflight: Dict[str, _Inflight] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = self.invalidations = 0
+
+    async def get_or_compute(self, key: str, tags: Iterable[str], compute: Callable[[], Any]) -> Any:
+        """`compute` es síncrono (usa la BD): corre en el threadpool. El valor no se debe mutar."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self._entries.pop(key, None)
+
+            job = self._inflight.get(key)
+            if job is None:
+                self.misses += 1
+                job = self._inflight[key] = _Inflight(asyncio.get_running_loop().create_future(), frozenset(tags))
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            try:
+                return await asyncio.shield(job.future)
+            except _LeaderCancelled:
+                return await self.get_or_compute(key, tags, compute)
+
+        try:
+            value = await run_in_threadpool(compute)
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(key) is job:
+                    del self._inflight[key]
+            job.future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            job.future.exception()  # marcada como leída aunque nadie más esperara
+            raise
+
+        with self._lock:
+            # si hubo invalidación mientras calculábamos, el resultado se entrega pero no se guarda
+            if self._inflight.get(key) is job:
+                del self._inflight[key]
+                for fn in job.patches:
+                    value = fn(value)
+                self._entries[key] = (time.monotonic() + self.ttl, job.tags, value)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        job.future.set_result(value)
+        return value
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e[1] & set(tags)]:
+                del self._entries[key]
+            # los cálculos en curso de esos tags quedan huérfanos: el próximo request arranca uno nuevo
+            for key in [k for k, j in self._inflight.items() if j.tags & set(tags)]:
+                del self._inflight[key]
+            self.invalidations += 1
+
+    def patch(self, key: str, fn: Callable[[Any], Any]):
+        """Actualiza una entrada sin recalcularla (`fn` devuelve un valor nuevo, no muta el anterior)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], entry[1], fn(entry[2]))
+            job = self._inflight.get(key)
+            if job is not None:
+                job.patches.append(fn)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._inflight.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+        }
+
+admin_cache = ResponseCache(settings.ADMIN_CACHE_MAX_ENTRIES, settings.ADMIN_CACHE_TTL_SECONDS)
+
+def _move_driver(event: Dict[str, Any]) -> Callable[[dict], dict]:
+    def fn(data: dict) -> dict:
+        drivers = [d for d in data["drivers"] if d["id"] != event["driver_id"]]
+        drivers.append({
+            "id": event["driver_id"],
+            "full_name": event.get("full_name", ""),
+            "username": event.get("username", ""),
+            "lat": event["lat"],
+            "lng": event["lng"],
+            "at": event.get("at"),
+        })
+        drivers.sort(key=lambda d: d["id"], reverse=True)
+        return {**data, "drivers": drivers}
+    return fn
+
+def on_event(event: Dict[str, Any]):
+    """Invalidación dirigida por los mismos eventos que reciben los admins por SSE."""
+    kind = event.get("type")
+    if kind == "DRIVER_LOCATION":
+        # llega cada pocos segundos por driver: se mueve el marcador en la respuesta cacheada, sin recalcular
+        admin_cache.patch("map_data", _move_driver(event))
+    elif kind in ("PACKAGE_CLOSED", "PACKAGES_ASSIGNED", "PACKAGES_UNASSIGNED"):
+        # assign_by_code puede reabrir un cerrado: también cambia totales y el mapa
+        admin_cache.invalidate("drivers_stats", "map_data")
@@ -0,0 +1,121 @@
+import math
+import numpy as np
+from sqlalchemy.orm import Session
+from . import models
+from .routing import optimize_route, route_km
+
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LNG = 111.320
+
+def _to_km(lat, lng, lat0: float) -> np.ndarray:
+    """Proyección equirectangular local: suficiente para agrupar dentro de una ciudad."""
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    return np.column_stack((lng * KM_PER_DEG_LNG * math.cos(math.radians(lat0)), lat * KM_PER_DEG_LAT))
+
+def _balanced_caps(n: int, capacities: np.ndarray) -> np.ndarray:
+    """Cupo efectivo por driver: reparto proporcional a su capacidad (rutas parejas), sin pasarse de ella."""
+    total = int(capacities.sum())
+    if total <= n:
+        return capacities.copy()
+    share = np.ceil(n * capacities / total).astype(int)
+    return np.minimum(share, capacities)
+
+def _init_centers(pts: np.ndarray, k: int, seeds: list[np.ndarray | None], rng) -> np.ndarray:
+    """Centro inicial = ubicación del driver si se conoce; el resto por k-means++."""
+    centers = np.empty((k, 2))
+    known = [i for i, s in enumerate(seeds) if s is not None]
+    for i in known:
+        centers[i] = seeds[i]
+    chosen = [centers[i] for i in known]
+    for i in range(k):
+        if seeds[i] is not None:
+            continue
+        if not chosen:
+            c = pts[rng.integers(len(pts))]
+        else:
+            d2 = ((pts[:, None, :] - np.array(chosen)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+            c = pts[rng.choice(len(pts), p=d2 / d2.sum())] if d2.sum() > 0 else pts[rng.integers(len(pts))]
+        centers[i] = c
+        chosen.append(c)
+    return centers
+
+def _capacitated_assign(d: np.ndarray, caps: np.ndarray) -> np.ndarray:
+    """Asigna cada punto a su centro más cercano con cupo libre (greedy por distancia global)."""
+    n, k = d.shape
+    labels = np.full(n, -1)
+    load = np.zeros(k, dtype=int)
+    remaining = n
+    for flat in np.argsort(d, axis=None, kind="stable"):
+        i, j = divmod(int(flat), k)
+        if labels[i] >= 0 or load[j] >= caps[j]:
+            continue
+        labels[i] = j
+        load[j] += 1
+        remaining -= 1
+        if remaining == 0 or (load >= caps).all():
+            break
+    return labels
+
+def balanced_kmeans(
+    lat, lng, capacities: list[int], seeds: list[tuple[float, float] | None] | None = None, max_iter: int = 25
+) -> np.ndarray:
+    """Etiqueta cada punto con el índice de driver (o -1 si no entra por capacidad).
+
+    K-means con cupos: distancias punto-centro vectorizadas (NumPy), asignación
+    greedy respetando la capacidad y recálculo de centros hasta estabilizar.
+    """
+    n, k = len(lat), len(capacities)
+    if n == 0 or k == 0:
+        return np.full(n, -1)
+    lat0 = float(np.mean(lat))
+    pts = _to_km(lat, lng, lat0)
+    seeds_km = [None if s is None else _to_km([s[0]], [s[1]], lat0)[0] for s in (seeds or [None] * k)]
+    caps = _balanced_caps(n, np.asarray(capacities, dtype=int))
+
+    centers = _init_centers(pts, k, seeds_km, np.random.default_rng(0))
+    labels = np.full(n, -1)
+    for _ in range(max_iter):
+        d = np.sqrt(((pts[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        new = _capacitated_assign(d, caps)
+        if np.array_equal(new, labels):
+            break
+        labels = new
+        for j in range(k):
+            members = pts[labels == j]
+            if len(members):
+                centers[j] = members.mean(axis=0)
+    return labels
+
+def propose_assignment(db: Session, drivers: list[models.User], capacities: list[int]) -> dict:
+    """Propuesta (sin guardar) para los paquetes pendientes sin driver."""
+    pkgs = (
+        db.query(models.Package)
+        .filter(models.Package.driver_id.is_(None), models.Package.status == models.PackageStatus.assigned)
+        .order_by(models.Package.id)
+        .all()
+    )
+    geo = [p for p in pkgs if p.dest_lat is not None and p.dest_lng is not None]
+    seeds = [(d.last_lat, d.last_lng) if d.last_lat is not None and d.last_lng is not None else None for d in drivers]
+    labels = balanced_kmeans([p.dest_lat for p in geo], [p.dest_lng for p in geo], capacities, seeds)
+
+    routes = []
+    for j, d in enumerate(drivers):
+        members = [geo[i] for i in np.flatnonzero(labels == j)]
+        lat = [p.dest_lat for p in members]
+        lng = [p.dest_lng for p in members]
+        order = optimize_route(lat, lng, seeds[j], time_budget_ms=50)
+        routes.append({
+            "driver_id": d.id,
+            "full_name": d.full_name,
+            "package_ids": [p.id for p in members],
+            "codes": [p.code for p in members],
+            "km": round(route_km(lat, lng, order, seeds[j]), 2),
+        })
+
+    left = [geo[i] for i in np.flatnonzero(labels < 0)] + [p for p in pkgs if p.dest_lat is None or p.dest_lng is None]
+    return {
+        "routes": routes,
+        "unassigned_ids": [p.id for p in left],
+        "unassigned_codes": [p.code for p in left],
+    }
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from typing import Any, Dict, Set
+from .sse import broadcaster
+
+class DriverHub:
+    """Canales WebSocket por driver (un driver puede tener varias pestañas/dispositivos)."""
+
+    def __init__(self):
+        self._clients: Dict[int, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def register(self, driver_id: int) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=100)
+        async with self._lock:
+            self._clients.setdefault(driver_id, set()).add(q)
+        return q
+
+    async def unregister(self, driver_id: int, q: asyncio.Queue):
+        async with self._lock:
+            qs = self._clients.get(driver_id)
+            if qs is not None:
+                qs.discard(q)
+                if not qs:
+                    del self._clients[driver_id]
+
+    async def send(self, driver_id: int, event: Dict[str, Any]):
+        data = json.dumps(event, ensure_ascii=False)
+        async with self._lock:
+            clients = list(self._clients.get(driver_id, ()))
+
+        # no bloqueamos si algún cliente está lento
+        for q in clients:
+            try:
+                q.put_nowait(data)
+            except asyncio.QueueFull:
+                pass
+
+    def connections(self) -> int:
+        return sum(len(qs) for qs in list(self._clients.values()))
+
+driver_hub = DriverHub()
+
+async def publish_assignment(event: Dict[str, Any]):
+    """Asignaciones/reasignaciones/cancelaciones: a admins por SSE y al driver afectado por su WebSocket."""
+    await broadcaster.publish(event)
+    await driver_hub.send(event["driver_id"], event)
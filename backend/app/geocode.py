@@ -0,0 +1,109 @@
+import csv
+import os
+import re
+import unicodedata
+from sqlalchemy.orm import Session
+from . import models
+
+# Gazetteer base (centroides de distritos de Lima + algunas avenidas por tramos)
+SEED_CSV = os.path.join(os.path.dirname(__file__), "data", "gazetteer_lima.csv")
+
+_NUM_RE = re.compile(r"\b(\d{1,5})\b")
+
+def normalize(s: str | None) -> str:
+    """Mayúsculas, sin tildes ni puntuación: 'Av. Perú 1793' -> 'AV PERU 1793'."""
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = re.sub(r"[^0-9A-Za-z]+", " ", s)
+    return " ".join(s.upper().split())
+
+def read_gazetteer_csv(lines) -> list[models.GazetteerEntry]:
+    """Filas: distrito,via,num_desde,num_hasta,lat_desde,lng_desde,lat_hasta,lng_hasta."""
+    out = []
+    for row in csv.DictReader(lines):
+        lat_from, lng_from = float(row["lat_desde"]), float(row["lng_desde"])
+        out.append(models.GazetteerEntry(
+            district=(row.get("distrito") or "").strip(),
+            street=(row.get("via") or "").strip(),
+            num_from=int(row.get("num_desde") or 0),
+            num_to=int(row.get("num_hasta") or 0),
+            lat_from=lat_from,
+            lng_from=lng_from,
+            lat_to=float(row.get("lat_hasta") or lat_from),
+            lng_to=float(row.get("lng_hasta") or lng_from),
+        ))
+    return out
+
+def seed_gazetteer(db: Session):
+    """Carga el gazetteer base si la tabla está vacía."""
+    if db.query(models.GazetteerEntry.id).first():
+        return
+    with open(SEED_CSV, encoding="utf-8") as f:
+        db.add_all(read_gazetteer_csv(f))
+    db.commit()
+
+class Gazetteer:
+    """Índice en memoria del gazetteer: se carga una vez por request/lote, no por paquete."""
+
+    def __init__(self, entries: list[models.GazetteerEntry]):
+        self._centroids: dict[str, tuple[float, float]] = {}
+        self._streets: dict[str, list[tuple[str, models.GazetteerEntry]]] = {}
+        for e in entries:
+            d = normalize(e.district)
+            if not e.street:
+                self._centroids[d] = (e.lat_from, e.lng_from)
+            else:
+                self._streets.setdefault(d, []).append((normalize(e.street), e))
+        # más largo primero: "SAN JUAN DE LURIGANCHO" antes que "LURIGANCHO"
+        self._districts = sorted(set(self._centroids) | set(self._streets), key=len, reverse=True)
+
+    @classmethod
+    def load(cls, db: Session) -> "Gazetteer":
+        return cls(db.query(models.GazetteerEntry).all())
+
+    def district_of(self, address: str) -> str:
+        a = f" {normalize(address)} "
+        for d in self._districts:
+            if f" {d} " in a:
+                return d
+        return ""
+
+    def geocode(self, address: str, district: str | None = None) -> tuple[float, float] | None:
+        a = normalize(address)
+        d = normalize(district)
+        if d not in self._centroids and d not in self._streets:
+            # distrito vacío o fuera del gazetteer ("SMP", "Surco"): se deduce de la dirección o se busca en todas las vías
+            d = self.district_of(address)
+
+        if d:
+            candidates = self._streets.get(d, [])
+        else:
+            candidates = [c for cs in self._streets.values() for c in cs]
+
+        padded = f" {a} "
+        matches = [(s, e) for s, e in candidates if f" {s} " in padded]
+        if matches:
+            street = max((s for s, _ in matches), key=len)
+            matches = [e for s, e in matches if s == street]
+            # numeración: primer número después del nombre de la vía
+            m = _NUM_RE.search(padded[padded.find(f" {street} ") + len(street) + 1:])
+            num = int(m.group(1)) if m else None
+            return _interpolate(matches, num)
+
+        return self._centroids.get(d)
+
+def _interpolate(entries: list[models.GazetteerEntry], num: int | None) -> tuple[float, float]:
+    if num is None:
+        e = entries[0]
+        return ((e.lat_from + e.lat_to) / 2, (e.lng_from + e.lng_to) / 2)
+
+    # tramo que contiene la numeración; si ninguno, el más cercano
+    def dist(e):
+        lo, hi = min(e.num_from, e.num_to), max(e.num_from, e.num_to)
+        return 0 if lo <= num <= hi else min(abs(num - lo), abs(num - hi))
+
+    e = min(entries, key=dist)
+    span = e.num_to - e.num_from
+    t = (num - e.num_from) / span if span else 0.0
+    t = min(1.0, max(0.0, t))
+    return (e.lat_from + t * (e.lat_to - e.lat_from), e.lng_from + t * (e.lng_to - e.lng_from))
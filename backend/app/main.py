@@ -1,8 +1,8 @@
 import os
 from fastapi import Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from .sse import broadcaster
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .settings import settings
@@ -10,8 +10,12 @@ from .db import Base, engine, SessionLocal
 from .routers.auth import router as auth_router
 from .routers.admin import router as admin_router
 from .routers.driver import router as driver_router
+from .routers.archive import router as archive_router
 from . import models
 from .security import hash_password
+from .geocode import seed_gazetteer
+from .metrics import MetricsMiddleware, instrument_engine, render_metrics
+from .cache import on_event as invalidate_admin_cache
 from sqlalchemy import text
 
 app = FastAPI(title=settings.APP_NAME)
@@ -24,6 +28,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+# las respuestas cacheadas del admin se invalidan con los mismos eventos que van por SSE
+broadcaster.add_listener(invalidate_admin_cache)
+
 # Serve uploaded evidence
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
@@ -31,6 +42,7 @@ app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads"
 app.include_router(auth_router)
 app.include_router(admin_router)
 app.include_router(driver_router)
+app.include_router(archive_router)
 
 @app.get("/events")
 async def sse_events(request: Request):
@@ -50,6 +62,12 @@ async def sse_events(request: Request):
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(404)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health():
     return {"ok": True}
@@ -70,6 +88,15 @@ def startup():
         conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS lat DOUBLE PRECISION"))
         conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS lng DOUBLE PRECISION"))
         conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS location_at TIMESTAMP"))
+        # packages: destino planificado + orden de ruta
+        conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS district VARCHAR(120) NOT NULL DEFAULT ''"))
+        conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS dest_lat DOUBLE PRECISION"))
+        conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS dest_lng DOUBLE PRECISION"))
+        conn.execute(text("ALTER TABLE packages ADD COLUMN IF NOT EXISTS route_seq INTEGER"))
+        # packages: pueden quedar sin driver hasta el despacho automático
+        conn.execute(text("ALTER TABLE packages ALTER COLUMN driver_id DROP NOT NULL"))
+        # packages: índice del día a día (create_all no agrega índices a tablas existentes)
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_packages_driver_status ON packages (driver_id, status)"))
 
     db = SessionLocal()
     try:
@@ -81,5 +108,6 @@ def startup():
                 role=models.Role.admin,
             ))
             db.commit()
+        seed_gazetteer(db)
     finally:
         db.close()
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .settings import settings
+from .sse import broadcaster
+from .driver_hub import driver_hub
+from .cache import admin_cache
+
+log = logging.getLogger("zero.perf")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+STREAM_BUCKETS = (1, 10, 60, 300, 900, 1800, 3600, 14400)
+
+# conexiones de larga duración: van a su propio histograma, no a la latencia de requests
+STREAMING_ROUTES = {"/events"}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, name: str, doc: str, buckets: tuple):
+        self.name, self.doc, self.buckets = name, doc, buckets
+        self._data: Dict[Labels, list] = {}  # labels -> [counts por bucket..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            row = self._data.get(key)
+            if row is None:
+                row = self._data[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._data.items()]
+        for key, row in items:
+            for b, n in zip(self.buckets, row):
+                out.append(f"{self.name}_bucket{_fmt(key + (('le', _num(b)),))} {n}")
+            out.append(f"{self.name}_bucket{_fmt(key + (('le', '+Inf'),))} {row[-1]}")
+            out.append(f"{self.name}_sum{_fmt(key)} {row[-2]}")
+            out.append(f"{self.name}_count{_fmt(key)} {row[-1]}")
+        return out
+
+class Counter:
+    def __init__(self, name: str, doc: str):
+        self.name, self.doc = name, doc
+        self._data: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._data[key] = self._data.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._data.items())
+        out += [f"{self.name}{_fmt(k)} {v}" for k, v in items]
+        return out
+
+def _num(v: float) -> str:
+    return repr(float(v))
+
+def _fmt(labels: Labels) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+def _gauge(name: str, doc: str, value: float) -> list[str]:
+    return [f"# HELP {name} {doc}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Latencia por ruta.", LATENCY_BUCKETS)
+REQUESTS = Counter("http_requests_total", "Requests por ruta y código HTTP.")
+REQUEST_QUERIES = Histogram("http_request_db_statements", "Sentencias SQL por request.", QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Tiempo en BD por request.", LATENCY_BUCKETS)
+QUERIES = Counter("db_statements_total", "Sentencias SQL ejecutadas.")
+SLOW_QUERIES = Counter("db_slow_statements_total", "Sentencias SQL sobre SLOW_QUERY_MS.")
+STREAM_DURATION = Histogram("http_stream_duration_seconds", "Duración de conexiones streaming (SSE).", STREAM_BUCKETS)
+
+# [sentencias, segundos] del request en curso (objeto mutable: lo comparten los hilos del threadpool)
+_request_db: ContextVar[list | None] = ContextVar("request_db", default=None)
+
+def instrument_engine(engine: Engine):
+    """Cuenta y cronometra cada sentencia; loguea las lentas con su SQL."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        QUERIES.inc()
+        stats = _request_db.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            SLOW_QUERIES.inc()
+            log.warning("slow query %.1f ms: %s", elapsed * 1000, " ".join(statement.split())[:2000])
+
+class MetricsMiddleware:
+    """ASGI puro (no bufferiza streaming/SSE): latencia y SQL por ruta + log de requests lentos."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = [0, 0.0]
+        token = _request_db.set(stats)
+        status = {"code": 500}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_db.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "<other>"
+            method = scope["method"]
+            REQUESTS.inc(method=method, route=route, status=str(status["code"]))
+            REQUEST_QUERIES.observe(stats[0], method=method, route=route)
+            REQUEST_DB_TIME.observe(stats[1], method=method, route=route)
+            if route in STREAMING_ROUTES:
+                STREAM_DURATION.observe(elapsed, route=route)
+            else:
+                REQUEST_LATENCY.observe(elapsed, method=method, route=route)
+                if elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+                    log.warning(
+                        "slow request %.1f ms: %s %s (%d SQL, %.1f ms en BD)",
+                        elapsed * 1000, method, scope["path"], stats[0], stats[1] * 1000,
+                    )
+
+def render_metrics() -> str:
+    sse = broadcaster.stats()
+    lines = []
+    for m in (REQUEST_LATENCY, REQUESTS, REQUEST_QUERIES, REQUEST_DB_TIME, QUERIES, SLOW_QUERIES, STREAM_DURATION):
+        lines += m.render()
+    lines += _gauge("sse_subscribers", "Clientes SSE conectados.", sse["subscribers"])
+    lines += _gauge("sse_queue_depth", "Eventos encolados sin entregar (suma de clientes).", sse["queued"])
+    lines += _gauge("sse_queue_depth_max", "Cola SSE más llena.", sse["max_queued"])
+    lines += [
+        "# HELP sse_events_dropped_total Eventos descartados por cola SSE llena.",
+        "# TYPE sse_events_dropped_total counter",
+        f"sse_events_dropped_total {sse['dropped']}",
+    ]
+    lines += _gauge("driver_ws_connections", "WebSockets de drivers conectados.", driver_hub.connections())
+    cache = admin_cache.stats()
+    lines += _gauge("admin_cache_entries", "Respuestas admin cacheadas.", cache["entries"])
+    lines += ["# HELP admin_cache_requests_total Lecturas admin cacheables por resultado.", "# TYPE admin_cache_requests_total counter"]
+    lines += [f'admin_cache_requests_total{{result="{k}"}} {cache[k]}' for k in ("hits", "misses", "coalesced")]
+    lines += [
+        "# HELP admin_cache_invalidations_total Invalidaciones por eventos.",
+        "# TYPE admin_cache_invalidations_total counter",
+        f"admin_cache_invalidations_total {cache['invalidations']}",
+    ]
+    return "\n".join(lines) + "\n"
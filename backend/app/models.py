@@ -1,6 +1,6 @@
 import enum
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Enum, ForeignKey, Text, Float
+from sqlalchemy import String, Integer, DateTime, Enum, ForeignKey, Text, Float, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
 
@@ -43,7 +43,7 @@ class Package(Base):
     address: Mapped[str] = mapped_column(Text, nullable=False)
     phone: Mapped[str] = mapped_column(String(60), default="", nullable=False)
 
-    driver_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
+    driver_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)  # None = sin asignar
     status: Mapped[PackageStatus] = mapped_column(Enum(PackageStatus), default=PackageStatus.assigned, nullable=False)
 
     pod_notes: Mapped[str] = mapped_column(Text, default="", nullable=False)  # NOT NULL
@@ -58,9 +58,18 @@ class Package(Base):
     lng: Mapped[float | None] = mapped_column(Float, nullable=True)
     location_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
-    driver: Mapped["User"] = relationship(back_populates="packages")
+    # ✅ Destino planificado (geocodificado al cargar, gazetteer local) + orden de ruta
+    district: Mapped[str] = mapped_column(String(120), default="", nullable=False)
+    dest_lat: Mapped[float | None] = mapped_column(Float, nullable=True)
+    dest_lng: Mapped[float | None] = mapped_column(Float, nullable=True)
+    route_seq: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None = ruta por recalcular
+
+    driver: Mapped["User | None"] = relationship(back_populates="packages")
     proofs: Mapped[list["ProofImage"]] = relationship(back_populates="package", cascade="all,delete-orphan")
 
+    # lo que consultan drivers y admins a diario: paquetes de un driver por estado
+    __table_args__ = (Index("ix_packages_driver_status", "driver_id", "status"),)
+
 class ProofImage(Base):
     __tablename__ = "proof_images"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -72,3 +81,56 @@ class ProofImage(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     package: Mapped["Package"] = relationship(back_populates="proofs")
+
+class GazetteerEntry(Base):
+    """Tramo de vía (o centroide de distrito si street == "") para geocodificar sin servicios externos."""
+    __tablename__ = "gazetteer"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    district: Mapped[str] = mapped_column(String(120), index=True, nullable=False)
+    street: Mapped[str] = mapped_column(String(255), default="", nullable=False)
+    num_from: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    num_to: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    lat_from: Mapped[float] = mapped_column(Float, nullable=False)
+    lng_from: Mapped[float] = mapped_column(Float, nullable=False)
+    lat_to: Mapped[float] = mapped_column(Float, nullable=False)
+    lng_to: Mapped[float] = mapped_column(Float, nullable=False)
+
+# ---- Archivo (frío): paquetes cerrados hace más de ARCHIVE_AFTER_DAYS, movidos por app.archive ----
+
+class ArchivedPackage(Base):
+    __tablename__ = "packages_archive"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)  # mismo id que tenía en packages
+    code: Mapped[str] = mapped_column(String(32), unique=True, index=True, nullable=False)
+    recipient_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    address: Mapped[str] = mapped_column(Text, nullable=False)
+    phone: Mapped[str] = mapped_column(String(60), default="", nullable=False)
+    district: Mapped[str] = mapped_column(String(120), default="", nullable=False)
+    driver_id: Mapped[int | None] = mapped_column(Integer, index=True, nullable=True)
+    status: Mapped[PackageStatus] = mapped_column(Enum(PackageStatus), nullable=False)
+    pod_notes: Mapped[str] = mapped_column(Text, default="", nullable=False)
+    non_delivery_reason: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    closed_at: Mapped[datetime | None] = mapped_column(DateTime, index=True, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    lat: Mapped[float | None] = mapped_column(Float, nullable=True)
+    lng: Mapped[float | None] = mapped_column(Float, nullable=True)
+    location_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    dest_lat: Mapped[float | None] = mapped_column(Float, nullable=True)
+    dest_lng: Mapped[float | None] = mapped_column(Float, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class ArchivedProofImage(Base):
+    __tablename__ = "proof_images_archive"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    package_id: Mapped[int] = mapped_column(Integer, index=True, nullable=False)
+    proof_type: Mapped[ProofType] = mapped_column(Enum(ProofType), nullable=False)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)  # en ARCHIVE_DIR como <filename>.gz
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class DriverArchiveStats(Base):
+    """Totales de lo archivado por driver, para que la efectividad no cambie al archivar."""
+    __tablename__ = "driver_archive_stats"
+    driver_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), primary_key=True)
+    delivered: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
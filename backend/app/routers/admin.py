@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+import csv
+import io
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy import func, case, update
 from ..db import get_db
 from ..deps import require_role
 from .. import models
-from ..schemas import DriverCreate, DriverOut, DriverStatsOut, PackageCreate, PackageOut, PackageAssignIn
+from ..schemas import (
+    DriverCreate, DriverOut, DriverStatsOut, PackageCreate, PackageOut, PackageAssignIn,
+    PackageImportOut, GazetteerImportOut,
+    AutoAssignIn, AutoAssignProposalOut, AutoAssignApplyIn, AutoAssignApplyOut,
+)
 from ..security import hash_password
 from ..utils import next_zero_code
+from ..geocode import Gazetteer, read_gazetteer_csv
+from ..routing import invalidate_route
+from ..dispatch import propose_assignment
+from ..archive import find_by_code, archived_proofs
+from ..driver_hub import publish_assignment
+from ..cache import admin_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -29,18 +42,62 @@ def _pkg_to_out(request: Request, pkg: models.Package) -> PackageOut:
         pod_notes=pkg.pod_notes,
         non_delivery_reason=pkg.non_delivery_reason,
         closed_at=pkg.closed_at,
+        district=pkg.district,
+        dest_lat=pkg.dest_lat,
+        dest_lng=pkg.dest_lng,
+        route_seq=pkg.route_seq,
         proofs=proofs,
     )
 
+def _archived_to_out(request: Request, pkg: models.ArchivedPackage, proofs: list[models.ArchivedProofImage]) -> PackageOut:
+    base = str(request.base_url).rstrip("/")
+    return PackageOut(
+        id=pkg.id,
+        code=pkg.code,
+        recipient_name=pkg.recipient_name,
+        address=pkg.address,
+        phone=pkg.phone,
+        driver_id=pkg.driver_id,
+        status=pkg.status.value,
+        pod_notes=pkg.pod_notes,
+        non_delivery_reason=pkg.non_delivery_reason,
+        closed_at=pkg.closed_at,
+        district=pkg.district,
+        dest_lat=pkg.dest_lat,
+        dest_lng=pkg.dest_lng,
+        archived=True,
+        proofs=[
+            {"id": pr.id, "proof_type": pr.proof_type.value, "url": f"{base}/api/archive/evidence/{pr.filename}"}
+            for pr in proofs
+        ],
+    )
+
+# Lecturas que todas las pestañas admin repiten en cada evento SSE: pasan por admin_cache
+# (invalidado en cache.on_event). Las respuestas cacheadas se comparten: no mutarlas.
+
+def _drivers(db: Session) -> list[DriverOut]:
+    drivers = db.query(models.User).filter(models.User.role == models.Role.driver).order_by(models.User.id.desc()).all()
+    return [DriverOut.model_validate(d) for d in drivers]
+
 @router.get("/drivers", response_model=list[DriverOut])
-def list_drivers(db: Session = Depends(get_db), _=Depends(require_role("admin"))):
-    return db.query(models.User).filter(models.User.role == models.Role.driver).order_by(models.User.id.desc()).all()
+async def list_drivers(db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    return await admin_cache.get_or_compute("drivers", ("drivers",), lambda: _drivers(db))
 
 @router.get("/drivers_stats", response_model=list[DriverStatsOut])
-def drivers_stats(db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+async def drivers_stats(db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    return await admin_cache.get_or_compute("drivers_stats", ("drivers_stats",), lambda: _drivers_stats(db))
+
+def _drivers_stats(db: Session) -> list[DriverStatsOut]:
     # counts by driver_id
-    delivered = func.sum(case((models.Package.status == models.PackageStatus.delivered, 1), else_=0))
-    failed = func.sum(case((models.Package.status == models.PackageStatus.not_delivered, 1), else_=0))
+    # + lo ya archivado (una fila por driver en driver_archive_stats)
+    delivered = (
+        func.coalesce(func.sum(case((models.Package.status == models.PackageStatus.delivered, 1), else_=0)), 0)
+        + func.coalesce(func.max(models.DriverArchiveStats.delivered), 0)
+    )
+    failed = (
+        func.coalesce(func.sum(case((models.Package.status == models.PackageStatus.not_delivered, 1), else_=0)), 0)
+        + func.coalesce(func.max(models.DriverArchiveStats.failed), 0)
+    )
     closed = delivered + failed
 
     rows = (
@@ -53,6 +110,7 @@ def drivers_stats(db: Session = Depends(get_db), _=Depends(require_role("admin")
             func.coalesce(closed, 0).label("closed"),
         )
         .outerjoin(models.Package, models.Package.driver_id == models.User.id)
+        .outerjoin(models.DriverArchiveStats, models.DriverArchiveStats.driver_id == models.User.id)
         .filter(models.User.role == models.Role.driver)
         .group_by(models.User.id)
         .order_by(models.User.id.desc())
@@ -80,25 +138,118 @@ def create_driver(payload: DriverCreate, db: Session = Depends(get_db), _=Depend
         role=models.Role.driver
     )
     db.add(d); db.commit(); db.refresh(d)
+    admin_cache.invalidate("drivers", "drivers_stats")
     return d
 
 @router.post("/packages", response_model=PackageOut)
 def create_package(payload: PackageCreate, request: Request, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
-    driver = db.get(models.User, payload.driver_id)
-    if not driver or driver.role != models.Role.driver:
-        raise HTTPException(400, "Driver inválido")
+    if payload.driver_id is not None:
+        driver = db.get(models.User, payload.driver_id)
+        if not driver or driver.role != models.Role.driver:
+            raise HTTPException(400, "Driver inválido")
     code = next_zero_code(db)
+    dest = Gazetteer.load(db).geocode(payload.address, payload.district)
     p = models.Package(
         code=code,
         recipient_name=payload.recipient_name,
         address=payload.address,
         phone=payload.phone or "",
+        district=payload.district or "",
+        dest_lat=dest[0] if dest else None,
+        dest_lng=dest[1] if dest else None,
         driver_id=payload.driver_id,
         status=models.PackageStatus.assigned,
     )
+    if payload.driver_id is not None:
+        invalidate_route(db, payload.driver_id)
     db.add(p); db.commit(); db.refresh(p)
+    if p.driver_id is not None:
+        # endpoint síncrono (la BD corre en el threadpool); el evento se publica en el event loop
+        from_thread.run(publish_assignment, {"type": "PACKAGES_ASSIGNED", "driver_id": p.driver_id, "package_ids": [p.id]})
     return _pkg_to_out(request, p)
 
+@router.post("/packages/import", response_model=PackageImportOut)
+def import_packages(
+    file: UploadFile = File(...),
+    driver_id: int | None = Form(None),
+    db: Session = Depends(get_db),
+    _=Depends(require_role("admin")),
+):
+    """Carga masiva desde CSV (Codigo_Paquete,Nombre,Apellido,Dirección,Distrito,Celular).
+
+    Geocodifica cada dirección contra el gazetteer local; códigos vacíos se generan.
+    Sin driver_id los paquetes quedan sin asignar (para despacho automático).
+    """
+    if driver_id is not None:
+        driver = db.get(models.User, driver_id)
+        if not driver or driver.role != models.Role.driver:
+            raise HTTPException(400, "Driver inválido")
+    try:
+        rows = list(csv.DictReader(io.StringIO(file.file.read().decode("utf-8-sig"))))
+    except UnicodeDecodeError:
+        raise HTTPException(400, "CSV debe estar en UTF-8")
+
+    gaz = Gazetteer.load(db)
+    given = {(r.get("Codigo_Paquete") or "").strip().upper() for r in rows} - {""}
+    existing = {c for (c,) in db.query(models.Package.code).filter(models.Package.code.in_(given))}
+    existing |= {c for (c,) in db.query(models.ArchivedPackage.code).filter(models.ArchivedPackage.code.in_(given))}
+
+    pkgs, skipped = [], []
+    for r in rows:
+        code = (r.get("Codigo_Paquete") or "").strip().upper()
+        address = (r.get("Dirección") or r.get("Direccion") or "").strip()
+        name = " ".join(x.strip() for x in (r.get("Nombre") or "", r.get("Apellido") or "") if x.strip())
+        if not address or not name or code in existing:
+            skipped.append(code or name or address)
+            continue
+        if code:
+            existing.add(code)
+        district = (r.get("Distrito") or "").strip()
+        dest = gaz.geocode(address, district)
+        pkgs.append(models.Package(
+            code=code or None,
+            recipient_name=name,
+            address=address,
+            phone=(r.get("Celular") or "").strip(),
+            district=district,
+            dest_lat=dest[0] if dest else None,
+            dest_lng=dest[1] if dest else None,
+            driver_id=driver_id,
+            status=models.PackageStatus.assigned,
+        ))
+
+    # códigos explícitos primero; los generados siguen al máximo resultante
+    db.add_all([p for p in pkgs if p.code])
+    db.flush()
+    n = int(next_zero_code(db)[4:])
+    for p in pkgs:
+        if not p.code:
+            p.code = f"ZERO{n:04d}"
+            n += 1
+            db.add(p)
+
+    if driver_id is not None:
+        invalidate_route(db, driver_id)
+    db.commit()
+    if driver_id is not None and pkgs:
+        from_thread.run(publish_assignment, {"type": "PACKAGES_ASSIGNED", "driver_id": driver_id, "package_ids": [p.id for p in pkgs]})
+    return PackageImportOut(
+        created=len(pkgs),
+        geocoded=sum(1 for p in pkgs if p.dest_lat is not None),
+        skipped=skipped,
+    )
+
+@router.post("/gazetteer/import", response_model=GazetteerImportOut)
+def import_gazetteer(file: UploadFile = File(...), db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    """Agrega tramos de vías (distrito,via,num_desde,num_hasta,lat_desde,lng_desde,lat_hasta,lng_hasta)."""
+    try:
+        entries = read_gazetteer_csv(io.StringIO(file.file.read().decode("utf-8-sig")))
+    except (UnicodeDecodeError, KeyError, ValueError):
+        raise HTTPException(400, "CSV de gazetteer inválido")
+    db.add_all(entries)
+    db.commit()
+    return GazetteerImportOut(loaded=len(entries))
+
 @router.get("/drivers/{driver_id}/packages", response_model=list[PackageOut])
 def driver_packages(driver_id: int, status: str | None = None, request: Request = None, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
     driver = db.get(models.User, driver_id)
@@ -120,28 +271,144 @@ def driver_packages(driver_id: int, status: str | None = None, request: Request
     pkgs = q.order_by(models.Package.updated_at.desc()).all()
     return [_pkg_to_out(request, p) for p in pkgs]
 
+@router.get("/packages/by_code/{code}", response_model=PackageOut)
+def package_by_code(code: str, request: Request, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    """Detalle por código; si ya salió de las tablas calientes, se lee del archivo."""
+    pkg, archived = find_by_code(db, code.strip().upper())
+    if not pkg:
+        raise HTTPException(404, "Paquete no encontrado")
+    if archived:
+        return _archived_to_out(request, pkg, archived_proofs(db, pkg.id))
+    return _pkg_to_out(request, pkg)
+
 @router.post("/packages/assign_by_code", response_model=dict)
 def assign_by_code(payload: PackageAssignIn, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
     code = payload.code.strip().upper()
-    pkg = db.query(models.Package).filter(models.Package.code == code).first()
+    pkg, archived = find_by_code(db, code)
     if not pkg:
         raise HTTPException(404, "Paquete no encontrado")
+    if archived:
+        raise HTTPException(400, "Paquete archivado (cerrado)")
     driver = db.get(models.User, payload.driver_id)
     if not driver or driver.role != models.Role.driver:
         raise HTTPException(400, "Driver inválido")
+    previous = pkg.driver_id
     pkg.driver_id = payload.driver_id
     pkg.status = models.PackageStatus.assigned
+    invalidate_route(db, payload.driver_id)
+    pkg.route_seq = None
     db.commit()
+
+    if previous is not None and previous != payload.driver_id:
+        from_thread.run(publish_assignment, {
+            "type": "PACKAGES_UNASSIGNED", "driver_id": previous, "package_ids": [pkg.id], "reason": "reassigned",
+        })
+    from_thread.run(publish_assignment, {"type": "PACKAGES_ASSIGNED", "driver_id": payload.driver_id, "package_ids": [pkg.id]})
     return {"assigned": code, "driver_id": payload.driver_id}
 
+@router.post("/packages/{package_id}/unassign", response_model=dict)
+def unassign_package(package_id: int, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    """Cancela la asignación de un pendiente: vuelve a la bolsa de despacho y se avisa al driver."""
+    pkg = db.get(models.Package, package_id)
+    if not pkg:
+        raise HTTPException(404, "Paquete no encontrado")
+    if pkg.status in (models.PackageStatus.delivered, models.PackageStatus.not_delivered):
+        raise HTTPException(400, "Paquete ya cerrado")
+    previous = pkg.driver_id
+    pkg.driver_id = None
+    pkg.route_seq = None
+    db.commit()
+
+    if previous is not None:
+        from_thread.run(publish_assignment, {
+            "type": "PACKAGES_UNASSIGNED", "driver_id": previous, "package_ids": [pkg.id], "reason": "cancelled",
+        })
+    return {"unassigned": pkg.code}
+
+def _dispatch_drivers(db: Session, payload: AutoAssignIn) -> tuple[list[models.User], list[int]]:
+    q = db.query(models.User).filter(models.User.role == models.Role.driver)
+    if payload.driver_ids is not None:
+        q = q.filter(models.User.id.in_(payload.driver_ids))
+    drivers = q.order_by(models.User.id).all()
+    if payload.driver_ids is not None and len(drivers) != len(set(payload.driver_ids)):
+        raise HTTPException(400, "Driver inválido")
+    # la capacidad es total: se descuenta lo que cada uno ya tiene pendiente
+    load = dict(
+        db.query(models.Package.driver_id, func.count(models.Package.id))
+        .filter(
+            models.Package.driver_id.in_([d.id for d in drivers]),
+            models.Package.status == models.PackageStatus.assigned,
+        )
+        .group_by(models.Package.driver_id)
+        .all()
+    )
+    caps = [payload.capacities.get(d.id, payload.capacity) - load.get(d.id, 0) for d in drivers]
+    pairs = [(d, c) for d, c in zip(drivers, caps) if c > 0]
+    return [d for d, _ in pairs], [c for _, c in pairs]
+
+@router.post("/auto_assign/preview", response_model=AutoAssignProposalOut)
+def auto_assign_preview(payload: AutoAssignIn, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    """Propone rutas balanceadas (k-means con cupos) para los paquetes sin driver. No guarda nada."""
+    drivers, caps = _dispatch_drivers(db, payload)
+    if not drivers:
+        raise HTTPException(400, "No hay repartidores con capacidad")
+    return propose_assignment(db, drivers, caps)
+
+@router.post("/auto_assign/apply", response_model=AutoAssignApplyOut)
+def auto_assign_apply(payload: AutoAssignApplyIn, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+    """Aplica una propuesta revisada con un UPDATE masivo por driver.
+
+    Solo toma paquetes que siguen sin driver; los que alguien asignó mientras tanto vuelven como conflictos.
+    """
+    driver_ids = {r.driver_id for r in payload.routes}
+    valid = {
+        i for (i,) in db.query(models.User.id)
+        .filter(models.User.id.in_(driver_ids), models.User.role == models.Role.driver)
+    }
+    if valid != driver_ids:
+        raise HTTPException(400, "Driver inválido")
+
+    wanted = {pid: r.driver_id for r in payload.routes for pid in r.package_ids}
+    by_driver: dict[int, list[int]] = {}
+    for pid, did in wanted.items():
+        by_driver.setdefault(did, []).append(pid)
+
+    # un UPDATE ... RETURNING por driver: solo cuenta lo que de verdad seguía libre al escribir
+    # (una asignación manual entre la propuesta y ahora queda como conflicto)
+    assigned: dict[int, list[int]] = {}
+    for did, ids in by_driver.items():
+        got = db.execute(
+            update(models.Package)
+            .where(
+                models.Package.id.in_(ids),
+                models.Package.driver_id.is_(None),
+                models.Package.status == models.PackageStatus.assigned,
+            )
+            .values(driver_id=did, route_seq=None)
+            .returning(models.Package.id),
+            execution_options={"synchronize_session": False},
+        ).scalars().all()
+        if got:
+            assigned[did] = sorted(got)
+    db.commit()
+
+    for did, ids in assigned.items():
+        from_thread.run(publish_assignment, {"type": "PACKAGES_ASSIGNED", "driver_id": did, "package_ids": ids})
+
+    done = {pid for ids in assigned.values() for pid in ids}
+    return AutoAssignApplyOut(assigned=len(done), conflicts=sorted(set(wanted) - done))
+
 
 @router.get("/map_data", response_model=dict)
-def map_data(request: Request, db: Session = Depends(get_db), _=Depends(require_role("admin"))):
+async def map_data(db: Session = Depends(get_db), _=Depends(require_role("admin"))):
     """Datos para el mapa admin.
 
     - drivers: última ubicación conocida (si existe)
     - packages: paquetes con coordenadas capturadas al cerrar (si el navegador permitió GPS)
     """
+    return await admin_cache.get_or_compute("map_data", ("map_data",), lambda: _map_data(db))
+
+def _map_data(db: Session) -> dict:
     # Drivers
     drivers = (
         db.query(models.User)
@@ -163,7 +430,6 @@ def map_data(request: Request, db: Session = Depends(get_db), _=Depends(require_
         })
 
     # Packages (solo los que tienen coordenadas)
-    base = str(request.base_url).rstrip("/")
     pkgs = (
         db.query(models.Package)
         .filter(models.Package.lat.isnot(None), models.Package.lng.isnot(None))
@@ -0,0 +1,18 @@
+import mimetypes
+import os
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from ..archive import archived_path
+
+router = APIRouter(prefix="/api/archive", tags=["archive"])
+
+@router.get("/evidence/{filename}")
+def archived_evidence(filename: str):
+    """Evidencia archivada: se sirve el .gz tal cual con Content-Encoding y la descomprime el navegador."""
+    if os.path.basename(filename) != filename:
+        raise HTTPException(404, "Evidencia no encontrada")
+    path = archived_path(filename)
+    if not os.path.exists(path):
+        raise HTTPException(404, "Evidencia no encontrada")
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return FileResponse(path, media_type=media_type, headers={"Content-Encoding": "gzip"})
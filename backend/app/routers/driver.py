@@ -1,16 +1,23 @@
+import asyncio
+import json
 import os
+import time
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
 from ..sse import broadcaster  # ✅ SSE broadcaster
+from ..driver_hub import driver_hub
 
-from ..db import get_db
-from ..deps import require_role
+from ..db import get_db, SessionLocal
+from ..deps import require_role, token_user_id
 from .. import models
 from ..schemas import PackageOut, DriverProgressOut
 from ..settings import settings
+from ..routing import plan_driver_route
 
 router = APIRouter(prefix="/api/driver", tags=["driver"])
 
@@ -38,7 +45,8 @@ def _pkg_out(request: Request, pkg: models.Package) -> PackageOut:
     return PackageOut(
         id=pkg.id, code=pkg.code, recipient_name=pkg.recipient_name, address=pkg.address, phone=pkg.phone,
         driver_id=pkg.driver_id, status=pkg.status.value, pod_notes=pkg.pod_notes,
-        non_delivery_reason=pkg.non_delivery_reason, closed_at=pkg.closed_at, proofs=proofs
+        non_delivery_reason=pkg.non_delivery_reason, closed_at=pkg.closed_at,
+        district=pkg.district, dest_lat=pkg.dest_lat, dest_lng=pkg.dest_lng, route_seq=pkg.route_seq, proofs=proofs
     )
 
 @router.get("/reasons", response_model=list[str])
@@ -47,8 +55,18 @@ def reasons(user=Depends(require_role("driver"))):
 
 @router.get("/packages", response_model=list[PackageOut])
 def my_packages(request: Request, db: Session = Depends(get_db), user=Depends(require_role("driver"))):
-    pkgs = db.query(models.Package).filter(models.Package.driver_id == user.id).order_by(models.Package.updated_at.desc()).all()
-    return [_pkg_out(request, p) for p in pkgs]
+    """Pendientes en orden de ruta optimizada (se recalcula si hubo asignaciones nuevas); luego cerrados."""
+    q = db.query(models.Package).filter(models.Package.driver_id == user.id).order_by(models.Package.updated_at.desc())
+    pkgs = q.all()
+    pending = [p for p in pkgs if p.status == models.PackageStatus.assigned]
+    if any(p.route_seq is None and p.dest_lat is not None for p in pending):
+        plan_driver_route(db, user, pending)
+        pkgs = q.all()  # una sola recarga en vez de refrescar paquete por paquete
+        pending = [p for p in pkgs if p.status == models.PackageStatus.assigned]
+    # sin coordenadas al final (mantienen orden por updated_at)
+    pending.sort(key=lambda p: (p.route_seq is None or p.dest_lat is None, p.route_seq or 0))
+    closed = [p for p in pkgs if p.status != models.PackageStatus.assigned]
+    return [_pkg_out(request, p) for p in pending + closed]
 
 @router.get("/packages/{package_id}", response_model=PackageOut)
 def package_detail(package_id: int, request: Request, db: Session = Depends(get_db), user=Depends(require_role("driver"))):
@@ -91,6 +109,145 @@ async def update_location(
 
     return {"ok": True}
 
+def _parse_fixes(raw: str) -> list[tuple[float, float, datetime]]:
+    """Uplink compacto: [lat,lng], [lat,lng,ts_ms] o una lista de esos (lote acumulado sin señal)."""
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return []
+    if not isinstance(data, list) or not data:
+        return []
+    items = data if isinstance(data[0], list) else [data]
+    now = datetime.utcnow()
+    out = []
+    for it in items:
+        if not isinstance(it, list) or len(it) < 2:
+            continue
+        try:
+            lat, lng = float(it[0]), float(it[1])
+        except (TypeError, ValueError):
+            continue
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            continue
+        at = now
+        if len(it) > 2:
+            try:
+                at = min(datetime.utcfromtimestamp(float(it[2]) / 1000), now)
+            except (TypeError, ValueError, OverflowError, OSError):
+                pass
+        out.append((lat, lng, at))
+    return out
+
+def _ws_driver(user_id: int | None) -> tuple[int, str, str] | None:
+    if user_id is None:
+        return None
+    db = SessionLocal()
+    try:
+        u = db.get(models.User, user_id)
+        if not u or u.role != models.Role.driver:
+            return None
+        return u.id, u.full_name, u.username
+    finally:
+        db.close()
+
+def _save_location(user_id: int, lat: float, lng: float, at: datetime):
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(models.User).where(models.User.id == user_id)
+            .values(last_lat=lat, last_lng=lng, last_location_at=at)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+@router.websocket("/ws")
+async def driver_socket(ws: WebSocket):
+    """Canal persistente del driver: sube fixes GPS y recibe asignaciones al instante.
+
+    El primer mensaje debe ser {"token": "..."} (no va en la URL para que no quede en logs).
+    La ubicación se difunde a admins cada DRIVER_LOCATION_PUBLISH_SECONDS y se guarda
+    en BD cada DRIVER_LOCATION_FLUSH_SECONDS (y al desconectar), no en cada fix.
+    """
+    await ws.accept()
+    try:
+        hello = json.loads(await asyncio.wait_for(ws.receive_text(), timeout=10))
+        user_id = token_user_id(str(hello.get("token", "")))
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, AttributeError, KeyError):  # KeyError: frame binario
+        user_id = None
+    driver = await run_in_threadpool(_ws_driver, user_id)
+    if driver is None:
+        await ws.close(code=4401)
+        return
+    driver_id, full_name, username = driver
+
+    q = await driver_hub.register(driver_id)
+
+    async def downlink():
+        try:
+            await ws.send_text(json.dumps({"type": "hello", "driver_id": driver_id}))
+            while True:
+                try:
+                    data = await asyncio.wait_for(q.get(), timeout=25)
+                except asyncio.TimeoutError:
+                    data = '{"type":"ping"}'  # mantiene viva la conexión tras proxies
+                await ws.send_text(data)
+        except Exception:
+            pass
+
+    sender = asyncio.create_task(downlink())
+    last = None
+    unpublished = dirty = False  # último fix aún sin difundir / sin guardar
+    published_at = flushed_at = 0.0
+    recv = asyncio.ensure_future(ws.receive())
+    try:
+        while True:
+            # si el driver se detiene, el último fix igual sale al vencer su ventana (publish/flush diferido)
+            now = time.monotonic()
+            due = []
+            if unpublished:
+                due.append(published_at + settings.DRIVER_LOCATION_PUBLISH_SECONDS - now)
+            if dirty:
+                due.append(flushed_at + settings.DRIVER_LOCATION_FLUSH_SECONDS - now)
+            done, _ = await asyncio.wait({recv}, timeout=max(0.0, min(due)) if due else None)
+            if done:
+                msg = recv.result()
+                if msg["type"] == "websocket.disconnect":
+                    break
+                recv = asyncio.ensure_future(ws.receive())
+                fixes = _parse_fixes(msg["text"]) if msg.get("text") is not None else []  # binario: se ignora
+                if fixes:
+                    last = max(fixes, key=lambda f: f[2])
+                    unpublished = dirty = True
+
+            now = time.monotonic()
+            if unpublished and now - published_at >= settings.DRIVER_LOCATION_PUBLISH_SECONDS:
+                published_at = now
+                unpublished = False
+                await broadcaster.publish({
+                    "type": "DRIVER_LOCATION",
+                    "driver_id": driver_id,
+                    "lat": last[0],
+                    "lng": last[1],
+                    "at": last[2].isoformat(),
+                    "full_name": full_name,
+                    "username": username,
+                })
+            if dirty and now - flushed_at >= settings.DRIVER_LOCATION_FLUSH_SECONDS:
+                flushed_at = now
+                dirty = False
+                await run_in_threadpool(_save_location, driver_id, *last)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        recv.cancel()
+        sender.cancel()
+        await driver_hub.unregister(driver_id, q)
+        if dirty and last is not None:
+            await run_in_threadpool(_save_location, driver_id, *last)
+
 @router.post("/packages/{package_id}/close_delivered", response_model=PackageOut)
 async def close_delivered(
     package_id: int,
@@ -0,0 +1,150 @@
+import time
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from . import models
+from .settings import settings
+
+EARTH_RADIUS_KM = 6371.0088
+_EPS = 1e-9
+
+def haversine_matrix(lat, lng) -> np.ndarray:
+    """Matriz NxN de distancias (km) entre todos los puntos, sin bucles Python."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lng = np.radians(np.asarray(lng, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def _augment(lat, lng, start) -> np.ndarray:
+    """Agrega nodo inicio (ubicación del driver, o comodín) y nodo fin comodín.
+
+    Los comodines están a distancia 0 de todos: así la ruta abierta se resuelve
+    como un camino con extremos fijos y 2-opt/Or-opt no necesitan casos especiales.
+    """
+    n = len(lat)
+    d = np.zeros((n + 2, n + 2))
+    if start is not None:
+        pts = haversine_matrix(np.append(lat, start[0]), np.append(lng, start[1]))
+        d[: n + 1, : n + 1] = pts
+    else:
+        d[:n, :n] = haversine_matrix(lat, lng)
+    return d
+
+def _nearest_neighbour(d: np.ndarray, free_start: bool) -> np.ndarray:
+    n = len(d) - 2
+    s, e = n, n + 1
+    visited = np.zeros(len(d), dtype=bool)
+    visited[[s, e]] = True
+    tour = [s]
+    cur = s
+    if free_start:
+        # sin ubicación del driver: arranca por la parada más periférica
+        cur = int(np.argmax(d[:n, :n].sum(axis=1)))
+        visited[cur] = True
+        tour.append(cur)
+    while len(tour) <= n:
+        cur = int(np.argmin(np.where(visited, np.inf, d[cur])))
+        visited[cur] = True
+        tour.append(cur)
+    tour.append(e)
+    return np.array(tour)
+
+def _two_opt_pass(d: np.ndarray, tour: np.ndarray, deadline: float) -> bool:
+    improved = False
+    n = len(tour)
+    for i in range(1, n - 2):
+        if time.perf_counter() > deadline:
+            break
+        a, b = tour[i - 1], tour[i]
+        js = np.arange(i + 1, n - 1)
+        c, e = tour[js], tour[js + 1]
+        delta = d[a, c] + d[b, e] - d[a, b] - d[c, e]
+        k = int(np.argmin(delta))
+        if delta[k] < -_EPS:
+            j = js[k]
+            tour[i : j + 1] = tour[i : j + 1][::-1]
+            improved = True
+    return improved
+
+def _or_opt_pass(d: np.ndarray, tour: np.ndarray, deadline: float) -> tuple[np.ndarray, bool]:
+    improved = False
+    for seg_len in (1, 2, 3):
+        i = 1
+        while i + seg_len < len(tour):
+            if time.perf_counter() > deadline:
+                return tour, improved
+            seg = tour[i : i + seg_len]
+            p, nx = tour[i - 1], tour[i + seg_len]
+            s0, sl = seg[0], seg[-1]
+            gain = d[p, s0] + d[sl, nx] - d[p, nx]
+
+            rest = np.concatenate((tour[:i], tour[i + seg_len :]))
+            u, v = rest[:-1], rest[1:]
+            fwd = d[u, s0] + d[sl, v] - d[u, v]
+            rev = d[u, sl] + d[s0, v] - d[u, v]
+            k_f, k_r = int(np.argmin(fwd)), int(np.argmin(rev))
+            if min(fwd[k_f], rev[k_r]) < gain - _EPS:
+                if fwd[k_f] <= rev[k_r]:
+                    k, ins = k_f, seg
+                else:
+                    k, ins = k_r, seg[::-1]
+                tour = np.concatenate((rest[: k + 1], ins, rest[k + 1 :]))
+                improved = True
+            i += 1
+    return tour, improved
+
+def optimize_route(lat, lng, start: tuple[float, float] | None = None, time_budget_ms: int | None = None) -> list[int]:
+    """Orden de visita (índices de lat/lng) para una ruta abierta desde `start`.
+
+    Vecino más cercano como semilla y mejora 2-opt + Or-opt hasta que no mejora
+    o se acaba el presupuesto de tiempo (siempre devuelve la mejor ruta hasta ese momento).
+    """
+    n = len(lat)
+    if n <= 1:
+        return list(range(n))
+    budget = settings.ROUTE_TIME_BUDGET_MS if time_budget_ms is None else time_budget_ms
+    deadline = time.perf_counter() + budget / 1000.0
+
+    d = _augment(np.asarray(lat, dtype=float), np.asarray(lng, dtype=float), start)
+    tour = _nearest_neighbour(d, start is None)
+    while time.perf_counter() < deadline:
+        improved = _two_opt_pass(d, tour, deadline)
+        tour, moved = _or_opt_pass(d, tour, deadline)
+        if not (improved or moved):
+            break
+    return [int(x) for x in tour[1:-1]]
+
+def route_km(lat, lng, order: list[int], start: tuple[float, float] | None = None) -> float:
+    if not order:
+        return 0.0
+    pts_lat = ([start[0]] if start else []) + [lat[i] for i in order]
+    pts_lng = ([start[1]] if start else []) + [lng[i] for i in order]
+    d = haversine_matrix(pts_lat, pts_lng)
+    idx = np.arange(len(pts_lat) - 1)
+    return float(d[idx, idx + 1].sum())
+
+def invalidate_route(db: Session, driver_id: int):
+    """Marca la ruta del driver para recalcular (nueva asignación, etc.). No hace commit."""
+    (
+        db.query(models.Package)
+        .filter(models.Package.driver_id == driver_id, models.Package.status == models.PackageStatus.assigned)
+        .update(
+            # updated_at se conserva: reordenar la ruta no es una modificación del paquete
+            {models.Package.route_seq: None, models.Package.updated_at: models.Package.updated_at},
+            synchronize_session=False,
+        )
+    )
+
+def plan_driver_route(db: Session, driver: models.User, pending: list[models.Package]):
+    """Optimiza y guarda route_seq de los pendientes con destino geocodificado."""
+    stops = [p for p in pending if p.dest_lat is not None and p.dest_lng is not None]
+    start = None
+    if driver.last_lat is not None and driver.last_lng is not None:
+        start = (driver.last_lat, driver.last_lng)
+    order = optimize_route([p.dest_lat for p in stops], [p.dest_lng for p in stops], start)
+    rows = [{"id": stops[i].id, "route_seq": seq, "updated_at": stops[i].updated_at} for seq, i in enumerate(order, start=1)]
+    if rows:
+        db.execute(update(models.Package), rows)
+    db.commit()
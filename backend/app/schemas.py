@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class LoginIn(BaseModel):
     username: str = Field(min_length=1, max_length=120)
@@ -40,7 +40,8 @@ class PackageCreate(BaseModel):
     recipient_name: str = Field(min_length=1, max_length=255)
     address: str = Field(min_length=1, max_length=2000)
     phone: Optional[str] = ""
-    driver_id: int
+    district: Optional[str] = ""
+    driver_id: Optional[int] = None  # None = queda para despacho automático
 
 class ProofOut(BaseModel):
     id: int
@@ -55,11 +56,16 @@ class PackageOut(BaseModel):
     recipient_name: str
     address: str
     phone: str
-    driver_id: int
+    driver_id: Optional[int]
     status: str
     pod_notes: str
     non_delivery_reason: Optional[str]
     closed_at: Optional[datetime]
+    district: str = ""
+    dest_lat: Optional[float] = None
+    dest_lng: Optional[float] = None
+    route_seq: Optional[int] = None
+    archived: bool = False
     proofs: List[ProofOut] = []
     class Config:
         from_attributes = True
@@ -72,3 +78,35 @@ class DriverProgressOut(BaseModel):
     closed: int
     total: int
     fraction: str
+
+class PackageImportOut(BaseModel):
+    created: int
+    geocoded: int
+    skipped: List[str] = []
+
+class GazetteerImportOut(BaseModel):
+    loaded: int
+
+class AutoAssignIn(BaseModel):
+    driver_ids: Optional[List[int]] = None  # None = todos los repartidores
+    capacity: int = Field(default=150, ge=1, le=5000)
+    capacities: Dict[int, int] = {}  # driver_id -> capacidad (sobrescribe `capacity`)
+
+class AutoAssignRoute(BaseModel):
+    driver_id: int
+    full_name: str = ""
+    package_ids: List[int]
+    codes: List[str] = []
+    km: float = 0.0
+
+class AutoAssignProposalOut(BaseModel):
+    routes: List[AutoAssignRoute]
+    unassigned_ids: List[int]
+    unassigned_codes: List[str]
+
+class AutoAssignApplyIn(BaseModel):
+    routes: List[AutoAssignRoute]
+
+class AutoAssignApplyOut(BaseModel):
+    assigned: int
+    conflicts: List[int] = []  # ya asignados por otra vía desde la propuesta
@@ -7,6 +7,26 @@ class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql+psycopg2://zero:zero@db:5432/zero"
     UPLOAD_DIR: str = "/data/uploads"
 
+    # Archivo: paquetes cerrados hace más de N días y sus evidencias (gzip) salen de las tablas calientes
+    ARCHIVE_DIR: str = "/data/archive"
+    ARCHIVE_AFTER_DAYS: int = 90
+
+    # Ruteo: presupuesto de tiempo del optimizador (2-opt/Or-opt) por driver
+    ROUTE_TIME_BUDGET_MS: int = 400
+
+    # WebSocket del driver: cada cuánto se persiste / se difunde la última ubicación
+    DRIVER_LOCATION_FLUSH_SECONDS: int = 30
+    DRIVER_LOCATION_PUBLISH_SECONDS: float = 2.0
+
+    # Instrumentación: /metrics (formato Prometheus) y logs de requests/queries lentos
+    METRICS_ENABLED: bool = True
+    SLOW_REQUEST_MS: int = 1000
+    SLOW_QUERY_MS: int = 200
+
+    # caché de lecturas admin (drivers, drivers_stats, map_data); se invalida con los eventos SSE
+    ADMIN_CACHE_TTL_SECONDS: float = 30.0
+    ADMIN_CACHE_MAX_ENTRIES: int = 64
+
     # Demo admin
     ADMIN_USER: str = "admin"
     ADMIN_PASSWORD: str = "admin123"
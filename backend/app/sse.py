@@ -1,11 +1,17 @@
 import asyncio
 import json
-from typing import Any, Dict, Set
+from typing import Any, Callable, Dict, List, Set
 
 class EventBroadcaster:
     def __init__(self):
         self._clients: Set[asyncio.Queue] = set()
         self._lock = asyncio.Lock()
+        self.dropped = 0
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    def add_listener(self, fn: Callable[[Dict[str, Any]], None]):
+        """Callback síncrono por cada evento publicado (p.ej. invalidar cachés)."""
+        self._listeners.append(fn)
 
     async def register(self) -> asyncio.Queue:
         q: asyncio.Queue = asyncio.Queue(maxsize=100)
@@ -18,6 +24,8 @@ class EventBroadcaster:
             self._clients.discard(q)
 
     async def publish(self, event: Dict[str, Any]):
+        for fn in self._listeners:
+            fn(event)
         data = json.dumps(event, ensure_ascii=False)
         async with self._lock:
             clients = list(self._clients)
@@ -27,6 +35,16 @@ class EventBroadcaster:
             try:
                 q.put_nowait(data)
             except asyncio.QueueFull:
-                pass
+                self.dropped += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Para /metrics: suscriptores y profundidad de colas (lectura sin lock, es aproximada)."""
+        depths = [q.qsize() for q in list(self._clients)]
+        return {
+            "subscribers": len(depths),
+            "queued": sum(depths),
+            "max_queued": max(depths, default=0),
+            "dropped": self.dropped,
+        }
 
 broadcaster = EventBroadcaster()
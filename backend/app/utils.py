@@ -3,7 +3,14 @@ from sqlalchemy import func
 from . import models
 
 def next_zero_code(db: Session) -> str:
-    max_code = db.query(func.max(models.Package.code)).scalar()
+    # también el archivo: un código archivado no se reutiliza
+    max_code = max(
+        (c for c in (
+            db.query(func.max(models.Package.code)).scalar(),
+            db.query(func.max(models.ArchivedPackage.code)).scalar(),
+        ) if c),
+        default=None,
+    )
     if not max_code or not str(max_code).startswith("ZERO"):
         return "ZERO0001"
     try:
@@ -0,0 +1,4 @@
+# Compartido por seed.py y loadtest.py (loadtest solo necesita httpx, no el backend).
+DRIVER_PREFIX = "bench_driver"
+DRIVER_PASSWORD = "bench123"
+CODE_PREFIX = "BENCH"
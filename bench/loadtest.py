@@ -0,0 +1,243 @@
+"""Carga realista contra un backend levantado, sembrado con bench/seed.py.
+
+Drivers: login, ping de ubicación, listar paquetes y cerrar con fotos (multipart).
+Admins: mantienen /events abierto y consultan drivers_stats / map_data.
+Reporta throughput, p50/p95/p99 por endpoint y el retraso de entrega de eventos SSE.
+
+    python bench/loadtest.py --drivers 15 --admins 5 --admin-poll 1 --duration 180 --out bench/results/latest.json
+    python bench/loadtest.py ... --baseline bench/results/baseline.json   # falla si p95 empeora
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from common import DRIVER_PREFIX, DRIVER_PASSWORD
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.sse_lag: list[float] = []
+        self.sse_events = 0
+
+    def record(self, name: str, ms: float, ok: bool):
+        self.latencies.setdefault(name, []).append(ms)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, math.ceil(p / 100 * len(s)) - 1))  # nearest-rank
+    return round(s[k], 2)
+
+def summary(values: list[float]) -> dict:
+    return {"p50": percentile(values, 50), "p95": percentile(values, 95), "p99": percentile(values, 99)}
+
+async def timed(stats: Stats, name: str, coro):
+    t = time.perf_counter()
+    try:
+        r = await coro
+        ok = r.status_code < 400
+    except httpx.HTTPError:
+        r, ok = None, False
+    stats.record(name, (time.perf_counter() - t) * 1000, ok)
+    return r if ok else None
+
+async def login(client: httpx.AsyncClient, stats: Stats, username: str, password: str) -> dict | None:
+    r = await timed(stats, "POST /api/auth/login", client.post("/api/auth/login", json={"username": username, "password": password}))
+    return {"Authorization": f"Bearer {r.json()['access_token']}"} if r else None
+
+async def driver_loop(client, stats: Stats, idx: int, args, stop_at: float, closes: dict, rng: random.Random):
+    lat, lng = -12.0464 + rng.uniform(-0.05, 0.05), -77.0428 + rng.uniform(-0.05, 0.05)
+    photo = os.urandom(args.photo_kb * 1024)
+    await asyncio.sleep(rng.uniform(0, args.think))  # desfasar drivers (también el login: bcrypt)
+    h = await login(client, stats, f"{DRIVER_PREFIX}{idx}", DRIVER_PASSWORD)
+    if not h:
+        return
+
+    while time.monotonic() < stop_at:
+        lat += rng.uniform(-0.001, 0.001)
+        lng += rng.uniform(-0.001, 0.001)
+        await timed(stats, "POST /api/driver/location", client.post("/api/driver/location", json={"lat": lat, "lng": lng}, headers=h))
+
+        r = await timed(stats, "GET /api/driver/packages", client.get("/api/driver/packages", headers=h))
+        pending = [p for p in (r.json() if r else []) if p["status"] == "ASSIGNED"]
+
+        if pending and rng.random() < args.close_prob:
+            p = pending[0]
+            files = [("images", (f"f{i}.jpg", photo, "image/jpeg")) for i in range(2)]
+            data = {"pod_notes": "bench", "lat": str(lat), "lng": str(lng)}
+            closes[p["id"]] = time.perf_counter()
+            if rng.random() < 0.8:
+                await timed(stats, "POST /api/driver/packages/{id}/close_delivered", client.post(
+                    f"/api/driver/packages/{p['id']}/close_delivered", data=data, files=files, headers=h))
+            else:
+                data["reason"] = "Cliente no se encuentra"
+                await timed(stats, "POST /api/driver/packages/{id}/close_not_delivered", client.post(
+                    f"/api/driver/packages/{p['id']}/close_not_delivered", data=data, files=files, headers=h))
+
+        await asyncio.sleep(args.think * rng.uniform(0.5, 1.5))
+
+async def sse_listener(client, stats: Stats, closes: dict):
+    """Retraso = desde que el driver envió el cierre hasta que este admin recibe PACKAGE_CLOSED."""
+    try:
+        async with client.stream("GET", "/events", timeout=None) as r:
+            async for line in r.aiter_lines():  # se cancela al terminar la corrida (con margen)
+                if not line.startswith("data: {"):
+                    continue
+                stats.sse_events += 1
+                msg = json.loads(line[6:])
+                sent = closes.get(msg.get("package_id")) if msg.get("type") == "PACKAGE_CLOSED" else None
+                if sent is not None:
+                    stats.sse_lag.append((time.perf_counter() - sent) * 1000)
+    except httpx.HTTPError:
+        stats.record("GET /events", 0.0, False)
+
+async def admin_loop(client, stats: Stats, args, stop_at: float, rng: random.Random):
+    h = await login(client, stats, args.admin_user, args.admin_password)
+    if not h:
+        return
+    await asyncio.sleep(rng.uniform(0, args.admin_poll))
+    while time.monotonic() < stop_at:
+        await timed(stats, "GET /api/admin/drivers_stats", client.get("/api/admin/drivers_stats", headers=h))
+        await timed(stats, "GET /api/admin/map_data", client.get("/api/admin/map_data", headers=h))
+        await asyncio.sleep(args.admin_poll * rng.uniform(0.8, 1.2))
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    stats = Stats()
+    closes: dict[int, float] = {}
+    limits = httpx.Limits(max_connections=args.drivers + 2 * args.admins + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        stop_at = time.monotonic() + args.duration
+        listeners = [asyncio.create_task(sse_listener(client, stats, closes)) for _ in range(args.admins)]
+        await asyncio.sleep(0.5)  # que los /events estén abiertos antes de cerrar paquetes
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(driver_loop(client, stats, i, args, stop_at, closes, random.Random(rng.random())) for i in range(args.drivers)),
+            *(admin_loop(client, stats, args, stop_at, random.Random(rng.random())) for _ in range(args.admins)),
+        )
+        elapsed = time.perf_counter() - start
+        await asyncio.sleep(2.0)  # últimos eventos en vuelo
+        for t in listeners:
+            t.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    endpoints = {}
+    for name, lat in sorted(stats.latencies.items()):
+        endpoints[name] = {
+            "count": len(lat),
+            "errors": stats.errors.get(name, 0),
+            "rps": round(len(lat) / elapsed, 2),
+            **summary(lat),
+        }
+    total = sum(e["count"] for e in endpoints.values())
+    return {
+        "meta": {
+            "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_rev(),
+            "base_url": args.base_url,
+            "cpus": os.cpu_count(),
+            "drivers": args.drivers,
+            "admins": args.admins,
+            "duration_s": round(elapsed, 1),
+            "think_s": args.think,
+            "admin_poll_s": args.admin_poll,
+            "close_prob": args.close_prob,
+            "photo_kb": args.photo_kb,
+        },
+        "throughput_rps": round(total / elapsed, 2),
+        "errors": sum(stats.errors.values()),
+        "endpoints": endpoints,
+        "sse": {"events": stats.sse_events, "closes_sent": len(closes), "lag_ms": summary(stats.sse_lag)},
+    }
+
+def print_report(res: dict, baseline: dict | None):
+    base_eps = (baseline or {}).get("endpoints", {})
+    print(f"\n{res['meta']['drivers']} drivers / {res['meta']['admins']} admins, {res['meta']['duration_s']} s "
+          f"-> {res['throughput_rps']} req/s, {res['errors']} errores")
+    print(f"{'endpoint':<58}{'n':>7}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}  Δp95")
+    for name, e in res["endpoints"].items():
+        b = base_eps.get(name)
+        delta = f"{(e['p95'] - b['p95']) / b['p95'] * 100:+.0f}%" if b and b["p95"] else ""
+        print(f"{name:<58}{e['count']:>7}{e['errors']:>5}{e['rps']:>8}{e['p50']:>9}{e['p95']:>9}{e['p99']:>9}  {delta}")
+    lag = res["sse"]["lag_ms"]
+    print(f"SSE: {res['sse']['events']} eventos recibidos, lag cierre→admin p50 {lag['p50']} / p95 {lag['p95']} / p99 {lag['p99']} ms")
+
+# login es bcrypt (CPU puro, a propósito lento): no dice nada del código que cambia entre corridas
+GATE_EXCLUDE = {"POST /api/auth/login"}
+
+def regressions(res: dict, baseline: dict, tolerance: float, min_samples: int) -> list[str]:
+    """Con pocas muestras el p95 nearest-rank es casi el máximo: esos endpoints no entran al gate."""
+    out = []
+    for name, b in baseline.get("endpoints", {}).items():
+        e = res["endpoints"].get(name)
+        if name in GATE_EXCLUDE or not e or min(e["count"], b["count"]) < min_samples:
+            continue
+        if b["p95"] and e["p95"] > b["p95"] * (1 + tolerance):
+            out.append(f"{name}: p95 {b['p95']} -> {e['p95']} ms")
+    b_lag, lag = baseline.get("sse", {}).get("lag_ms", {}), res["sse"]["lag_ms"]
+    if b_lag.get("p95") and lag["p95"] > b_lag["p95"] * (1 + tolerance):
+        out.append(f"SSE lag: p95 {b_lag['p95']} -> {lag['p95']} ms")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", default="http://localhost:8000")
+    ap.add_argument("--drivers", type=int, default=50, help="drivers simulados (bench_driver0..N-1)")
+    ap.add_argument("--admins", type=int, default=5)
+    ap.add_argument("--duration", type=float, default=60.0, help="segundos")
+    ap.add_argument("--think", type=float, default=2.0, help="pausa media entre iteraciones de un driver (s)")
+    ap.add_argument("--admin-poll", type=float, default=5.0, help="intervalo de polling admin (s)")
+    ap.add_argument("--close-prob", type=float, default=0.3, help="probabilidad de cerrar un paquete por iteración")
+    ap.add_argument("--photo-kb", type=int, default=200)
+    ap.add_argument("--admin-user", default=os.environ.get("ADMIN_USER", "admin"))
+    ap.add_argument("--admin-password", default=os.environ.get("ADMIN_PASSWORD", "admin123"))
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="guarda el resultado JSON (p.ej. bench/results/latest.json)")
+    ap.add_argument("--baseline", help="JSON de referencia: compara y sale con código 1 si hay regresión")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="regresión tolerada en p95 (0.25 = +25%%)")
+    ap.add_argument("--min-samples", type=int, default=200, help="muestras mínimas para que un endpoint entre al gate")
+    args = ap.parse_args()
+
+    if args.baseline and not os.path.exists(args.baseline):
+        ap.error(f"no existe la baseline {args.baseline}")
+
+    res = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(res, baseline)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    if baseline:
+        bad = regressions(res, baseline, args.tolerance, args.min_samples)
+        if bad:
+            print("\nREGRESIONES:\n  " + "\n  ".join(bad))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -41,14 +41,29 @@ export const api = {
     method:'POST', headers:{'Content-Type':'application/json'},
     body: JSON.stringify({username, full_name, password})
   }),
-  createPackage: (recipient_name, address, phone, driver_id) => req('/admin/packages', {
+  createPackage: (recipient_name, address, phone, driver_id, district) => req('/admin/packages', {
     method:'POST', headers:{'Content-Type':'application/json'},
-    body: JSON.stringify({recipient_name, address, phone, driver_id})
+    // driver_id vacío = sin asignar (queda para despacho automático)
+    body: JSON.stringify(driver_id ? {recipient_name, address, phone, driver_id, district} : {recipient_name, address, phone, district})
   }),
+  importPackages: (file, driver_id) => {
+    const fd = new FormData();
+    fd.append('file', file);
+    if (driver_id) fd.append('driver_id', String(driver_id));
+    return req('/admin/packages/import', {method:'POST', body: fd});
+  },
   assignByCode: (code, driver_id) => req('/admin/packages/assign_by_code', {
     method:'POST', headers:{'Content-Type':'application/json'},
     body: JSON.stringify({code, driver_id})
   }),
+  autoAssignPreview: (capacity) => req('/admin/auto_assign/preview', {
+    method:'POST', headers:{'Content-Type':'application/json'},
+    body: JSON.stringify({capacity})
+  }),
+  autoAssignApply: (routes) => req('/admin/auto_assign/apply', {
+    method:'POST', headers:{'Content-Type':'application/json'},
+    body: JSON.stringify({routes})
+  }),
   driverPackagesAdmin: (driver_id, status) => req(`/admin/drivers/${driver_id}/packages?status=${encodeURIComponent(status)}`),
   adminMapData: () => req('/admin/map_data'),
 
@@ -77,6 +92,14 @@ export const api = {
     return req(`/driver/packages/${id}/close_not_delivered`, {method:'POST', body: fd});
   },
 
+  // Canal WebSocket del driver (ubicación ↑, asignaciones ↓). Autentica con el primer mensaje.
+  driverSocket: () => {
+    const proto = window.location.protocol === 'https:' ? 'wss' : 'ws'
+    const ws = new WebSocket(`${proto}://${window.location.host}${API}/driver/ws`)
+    ws.addEventListener('open', () => ws.send(JSON.stringify({token: getToken()})))
+    return ws
+  },
+
   // Driver location (para mapa admin)
   updateMyLocation: (lat, lng) => req('/driver/location', {
     method:'POST', headers:{'Content-Type':'application/json'},
@@ -31,7 +31,7 @@ export default function Admin(){
   const [driverPkgs, setDriverPkgs] = useState([])
 
   const [newD, setNewD] = useState({username:'driver1', full_name:'Repartidor 1', password:'driver123'})
-  const [newP, setNewP] = useState({recipient_name:'', address:'', phone:'', driver_id:''})
+  const [newP, setNewP] = useState({recipient_name:'', address:'', district:'', phone:'', driver_id:null})
 
   const [searchCode, setSearchCode] = useState('')
   const [assignDriverId, setAssignDriverId] = useState('')
@@ -54,7 +54,8 @@ export default function Admin(){
       const d = await api.driversStats()
       setDrivers(d)
 
-      if (!newP.driver_id && d[0]) setNewP(v=>({...v, driver_id:String(d[0].id)}))
+      // null = aún sin elegir ('' es "Sin asignar"); funcional porque load() también corre desde el handler SSE
+      if (d[0]) setNewP(v=>(v.driver_id === null ? {...v, driver_id:String(d[0].id)} : v))
       if (!assignDriverId && d[0]) setAssignDriverId(String(d[0].id))
 
       // keep selectedDriver fresh
@@ -95,7 +96,7 @@ export default function Admin(){
     const handle = async (e) => {
       try{
         const msg = JSON.parse(e.data || '{}')
-        if (msg.type !== 'PACKAGE_CLOSED') return
+        if (!['PACKAGE_CLOSED', 'PACKAGES_ASSIGNED', 'PACKAGES_UNASSIGNED'].includes(msg.type)) return
 
         // 1) refresca lista principal
         await load()
@@ -136,8 +137,8 @@ export default function Admin(){
   const createPackage = async ()=>{
     try{
       setErr('')
-      await api.createPackage(newP.recipient_name, newP.address, newP.phone, Number(newP.driver_id))
-      setNewP(v=>({...v, recipient_name:'', address:'', phone:''}))
+      await api.createPackage(newP.recipient_name, newP.address, newP.phone, Number(newP.driver_id), newP.district)
+      setNewP(v=>({...v, recipient_name:'', address:'', district:'', phone:''}))
       await load()
       if (selectedDriver && Number(newP.driver_id) === selectedDriver.id){
         await loadDriverPackages(selectedDriver, driverTab)
@@ -145,6 +146,39 @@ export default function Admin(){
     }catch(e){ setErr(String(e.message||e)) }
   }
 
+  const [importFile, setImportFile] = useState(null)
+  const [importMsg, setImportMsg] = useState('')
+
+  const importPackages = async ()=>{
+    try{
+      setErr(''); setImportMsg('')
+      if (!importFile) throw new Error('Selecciona un CSV')
+      const r = await api.importPackages(importFile, Number(newP.driver_id))
+      setImportMsg(`Creados ${r.created} • con coordenadas ${r.geocoded} • omitidos ${r.skipped.length}`)
+      await load()
+    }catch(e){ setErr(String(e.message||e)) }
+  }
+
+  const [capacity, setCapacity] = useState('150')
+  const [proposal, setProposal] = useState(null)
+
+  const previewAutoAssign = async ()=>{
+    try{
+      setErr('')
+      setProposal(await api.autoAssignPreview(Number(capacity)))
+    }catch(e){ setErr(String(e.message||e)) }
+  }
+
+  const applyAutoAssign = async ()=>{
+    try{
+      setErr('')
+      const r = await api.autoAssignApply(proposal.routes)
+      setProposal(null)
+      if (r.conflicts?.length) setErr(`${r.conflicts.length} paquetes ya estaban asignados y se omitieron`)
+      await load()
+    }catch(e){ setErr(String(e.message||e)) }
+  }
+
   const assignByCode = async ()=>{
     try{
       setErr('')
@@ -206,18 +240,28 @@ export default function Admin(){
           <input className="input" value={newP.recipient_name} onChange={e=>setNewP(v=>({...v, recipient_name:e.target.value}))}/>
           <label>Dirección</label>
           <input className="input" value={newP.address} onChange={e=>setNewP(v=>({...v, address:e.target.value}))}/>
+          <label>Distrito</label>
+          <input className="input" value={newP.district} onChange={e=>setNewP(v=>({...v, district:e.target.value}))} placeholder="Miraflores"/>
           <label>Teléfono</label>
           <input className="input" value={newP.phone} onChange={e=>setNewP(v=>({...v, phone:e.target.value}))}/>
         </div>
         <div>
           <label>Repartidor</label>
-          <select className="input" value={newP.driver_id} onChange={e=>setNewP(v=>({...v, driver_id:e.target.value}))}>
+          <select className="input" value={newP.driver_id ?? ''} onChange={e=>setNewP(v=>({...v, driver_id:e.target.value}))}>
+            <option value="">Sin asignar (despacho automático)</option>
             {drivers.map(d => <option key={d.id} value={d.id}>{d.full_name} (@{d.username})</option>)}
           </select>
           <div style={{marginTop:12}}>
             <button onClick={createPackage} className="btn" style={{width:'100%'}}>Crear pedido</button>
           </div>
 
+          <label>Carga masiva (CSV)</label>
+          <input className="input" type="file" accept=".csv,text/csv" onChange={e=>setImportFile(e.target.files?.[0] || null)} />
+          <div style={{marginTop:12}}>
+            <button onClick={importPackages} className="btn secondary" style={{width:'100%'}}>Importar CSV</button>
+          </div>
+          {importMsg ? <div className="small">{importMsg}</div> : null}
+
           <hr />
           <h3>Asignar por código</h3>
           <div className="small">Escanea o escribe y asigna al driver.</div>
@@ -233,6 +277,27 @@ export default function Admin(){
           <div style={{marginTop:12}}>
             <button className="btn" style={{width:'100%'}} onClick={assignByCode}>Asignar</button>
           </div>
+
+          <hr />
+          <h3>Despacho automático</h3>
+          <div className="small">Agrupa los pedidos sin repartidor por zona en rutas balanceadas. Revisa y aplica.</div>
+          <label>Capacidad por repartidor</label>
+          <div className="row">
+            <input className="input" type="number" min="1" value={capacity} onChange={e=>setCapacity(e.target.value)} />
+            <button className="btn secondary" onClick={previewAutoAssign}>Proponer</button>
+          </div>
+          {proposal ? (
+            <div style={{marginTop:12}}>
+              {proposal.routes.map(r => (
+                <div key={r.driver_id} className="small">{r.full_name}: <span className="kbd">{r.package_ids.length}</span> pedidos • ~{r.km} km</div>
+              ))}
+              {proposal.unassigned_ids.length ? <div className="small">Sin asignar: <span className="kbd">{proposal.unassigned_ids.length}</span></div> : null}
+              <div className="row" style={{marginTop:12}}>
+                <button className="btn" onClick={applyAutoAssign}>Aplicar</button>
+                <button className="btn secondary" onClick={()=>setProposal(null)}>Descartar</button>
+              </div>
+            </div>
+          ) : null}
         </div allows compilation.
       </div>
       <AdminMap />
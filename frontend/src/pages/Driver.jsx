@@ -1,4 +1,4 @@
-import React, { useEffect, useMemo, useState } from 'react'
+import React, { useEffect, useMemo, useRef, useState } from 'react'
 import { api, getName } from '../api.js'
 import ScannerModal from '../components/ScannerModal.jsx'
 import { statusEmoji, statusLabel } from '../utils/status.js'
@@ -51,27 +51,63 @@ export default function Driver(){
 
   const [tab, setTab] = useState('PENDING') // PENDING/SUCCESS/FAILED
 
-  // ✅ GPS: manda ubicación del driver cada 3 minutos (para mapa admin)
+  // ✅ GPS + asignaciones por WebSocket: los fixes suben por el socket y los cambios de asignación bajan al instante
+  const loadRef = useRef(null)
   useEffect(() => {
-    let timer = null
-    const send = () => {
-      if (!navigator.geolocation) return
-      navigator.geolocation.getCurrentPosition(
+    let ws = null
+    let closed = false
+    let retry = null
+    let delay = 1000
+    let pending = [] // fixes acumulados mientras no hay conexión
+
+    const flush = () => {
+      if (ws && ws.readyState === WebSocket.OPEN && pending.length){
+        ws.send(JSON.stringify(pending))
+        pending = []
+      }
+    }
+
+    const connect = () => {
+      ws = api.driverSocket()
+      ws.onmessage = (e) => {
+        try{
+          const msg = JSON.parse(e.data || '{}')
+          if (msg.type === 'hello'){ delay = 1000; flush(); return }
+          if (msg.type === 'PACKAGES_ASSIGNED' || msg.type === 'PACKAGES_UNASSIGNED'){
+            if (loadRef.current) loadRef.current()
+          }
+        }catch{}
+      }
+      ws.onclose = (e) => {
+        if (closed || e.code === 4401) return // 4401 = token inválido, no reintentar
+        retry = setTimeout(connect, delay)
+        delay = Math.min(delay * 2, 30_000)
+      }
+    }
+    connect()
+
+    let watchId = null
+    if (navigator.geolocation){
+      watchId = navigator.geolocation.watchPosition(
         (pos)=>{
           const { latitude, longitude } = pos.coords || {}
           if (typeof latitude === 'number' && typeof longitude === 'number'){
-            api.updateMyLocation(latitude, longitude).catch(()=>{})
+            pending.push([latitude, longitude, pos.timestamp || Date.now()])
+            if (pending.length > 50) pending = pending.slice(-50)
+            flush()
           }
         },
         ()=>{},
-        { enableHighAccuracy: true, timeout: 7000, maximumAge: 60_000 }
+        { enableHighAccuracy: true, timeout: 15_000, maximumAge: 5_000 }
       )
     }
 
-    // primer envío
-    send()
-    timer = setInterval(send, 3 * 60 * 1000)
-    return () => { if (timer) clearInterval(timer) }
+    return () => {
+      closed = true
+      if (retry) clearTimeout(retry)
+      if (watchId !== null) navigator.geolocation.clearWatch(watchId)
+      if (ws) ws.close()
+    }
   }, [])
 
   const load = async ()=>{
@@ -82,6 +118,7 @@ export default function Driver(){
       if (!selectedReason && rs[0]) setSelectedReason(rs[0])
     }catch(e){ setErr(String(e.message||e)) }
   }
+  loadRef.current = load
   useEffect(()=>{ load() }, [])
 
   const filtered = useMemo(()=>{
@@ -305,7 +342,7 @@ export default function Driver(){
                   <div style={{fontWeight:950, fontSize:18, cursor:'pointer'}} onClick={()=>openDetail(p)}>
                     {statusEmoji(p.status)} {p.recipient_name}
                   </div>
-                  <div className="small"><span className="kbd">{p.code}</span> • {p.address}</div>
+                  <div className="small">{tab==='PENDING' && p.route_seq ? <span className="kbd">#{p.route_seq}</span> : null} <span className="kbd">{p.code}</span> • {p.address}</div>
                 </div>
                 <div className="row" style={{alignItems:'center'}}>
                   <span className="pill gray">{statusLabel(p.status)}</span>